@@ -10,7 +10,7 @@ from components.charts import (
     create_category_bar_chart
 )
 from components.filters import render_date_filter
-from utils.data_processor import DataProcessor
+from utils.pattern_detector import PatternDetector
 import time
 
 # Page configuration
@@ -23,6 +23,11 @@ st.set_page_config(
 # Initialize database
 db = DatabaseManager()
 
+@st.cache_resource
+def get_pattern_detector():
+    '''Shared detector whose results persist across reruns and sessions'''
+    return PatternDetector()
+
 # Define categories
 CATEGORIES = {
     'expense': [
@@ -61,8 +66,8 @@ with st.sidebar:
 if page == "Dashboard":
     st.header("Overview")
     
-    # Get all transactions
-    df = db.get_all_transactions()
+    # Get all transactions, reading only the columns the metrics and charts use
+    df = db.get_all_transactions(columns=['date', 'type', 'category', 'amount'])
     
     if not df.empty:
         # Calculate key metrics
@@ -107,7 +112,7 @@ elif page == "Add Transaction":
 elif page == "Transactions":
     st.header("All Transactions")
     
-    df = db.get_all_transactions()
+    df = db.get_all_transactions(columns=['id', 'date', 'type', 'category', 'amount', 'description'])
     
     if not df.empty:
         # Display transactions
@@ -138,13 +143,16 @@ elif page == "Transactions":
                 if transaction_id not in df['id'].values:
                     st.error("Transaction ID not found.")
                     time.sleep(1.5)  # Brief pause to show the toast before rerun
-                else:
-                    db.update_transaction_details(transaction_id, {
+                elif not db.update_transaction_details(transaction_id, {
                         "date": date,
                         "category": category,
                         "amount": amount,
                         "description": description
-                    })
+                    }):
+                    st.error("Transaction is archived and can no longer be edited.")
+                    time.sleep(1.5)  # Brief pause to show the toast before rerun
+                else:
+                    get_pattern_detector().reset()
                     st.success("✅ Transaction updated!")
                     time.sleep(1.5)  # Brief pause to show the toast before rerun
                     st.rerun()
@@ -158,28 +166,64 @@ elif page == "Transactions":
                 if transaction_id not in df['id'].values:
                     st.error("Transaction ID not found.")
                     time.sleep(1.5)  # Brief pause to show the toast before rerun
+                elif not db.delete_transaction(transaction_id):
+                    st.error("Transaction is archived and can no longer be deleted.")
+                    time.sleep(1.5)  # Brief pause to show the toast before rerun
                 else:
-                    db.delete_transaction(transaction_id)
+                    get_pattern_detector().reset()
                     st.success("✅ Transaction deleted!")
                     time.sleep(1.5)  # Brief pause to show the toast before rerun
                     st.rerun()
+        
+        # Option to archive closed years
+        with st.expander("Archive Closed Years"):
+            st.caption(f"Archived years: {', '.join(map(str, db.archive.years())) or 'none'}")
+            closed_years = db.get_archivable_years()
+            if closed_years:
+                year = st.selectbox("Year", closed_years, key="archive_year")
+                if st.button("Archive Year", type="secondary", key="archive_button"):
+                    moved = db.archive_year(year)
+                    st.success(f"✅ Archived {moved} transactions from {year}!")
+                    time.sleep(1.5)  # Brief pause to show the toast before rerun
+                    st.rerun()
+            else:
+                st.info("No closed years to archive.")
     else:
         st.info("No transactions to display.")
+    
+    # Option to export or restore a full backup
+    with st.expander("Backup & Restore"):
+        backup_dir = st.text_input("Backup Folder", "data/backup")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Export Backup", key="export_button"):
+                try:
+                    db.export_database(backup_dir)
+                    st.success(f"✅ Exported to {backup_dir}")
+                except ValueError as e:
+                    st.error(str(e))
+        with col2:
+            if st.button("Restore Backup", type="primary", key="restore_button"):
+                try:
+                    restored = db.restore_database(backup_dir)
+                    get_pattern_detector().reset()
+                    st.success(f"✅ Restored {restored} live transactions!")
+                    time.sleep(1.5)  # Brief pause to show the toast before rerun
+                    st.rerun()
+                except (FileNotFoundError, ValueError) as e:
+                    st.error(str(e))
 
 # Analytics Page
 elif page == "Analytics":
     st.header("Analytics")
     
-    df = db.get_all_transactions()
+    # Aggregates are computed inside each partition rather than on the full ledger
+    monthly_summary = db.get_monthly_totals()
     
-    if not df.empty:
-        processor = DataProcessor()
-        
+    if not monthly_summary.empty:
         # Monthly summary
         st.subheader("Monthly Summary")
-        monthly_summary = processor.calculate_monthly_summary(df)
-        if not monthly_summary.empty:
-            st.dataframe(monthly_summary, use_container_width=True)
+        st.dataframe(monthly_summary, use_container_width=True)
         
         st.divider()
         
@@ -188,13 +232,37 @@ elif page == "Analytics":
         
         with col1:
             st.subheader("Expense Categories")
-            expense_cats = processor.calculate_category_totals(df, 'expense')
+            expense_cats = db.get_category_totals('expense')
             st.dataframe(expense_cats, use_container_width=True)
         
         with col2:
             st.subheader("Income Categories")
-            income_cats = processor.calculate_category_totals(df, 'income')
+            income_cats = db.get_category_totals('income')
             st.dataframe(income_cats, use_container_width=True)
+        
+        st.divider()
+        
+        # Only rows added since the last visit are folded into the cached results
+        detector = get_pattern_detector()
+        detector.refresh(db)
+        
+        st.subheader("Recurring Payments")
+        recurring = detector.recurring()
+        if not recurring.empty:
+            st.dataframe(recurring, use_container_width=True, hide_index=True)
+        else:
+            st.info("No recurring payments detected yet.")
+        
+        st.subheader("Unusual Charges")
+        anomalies = detector.anomalies()
+        if not anomalies.empty:
+            st.dataframe(
+                anomalies[['id', 'date', 'category', 'amount', 'typical_amount', 'z_score', 'description']],
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("No unusual charges found.")
     else:
         st.info("No data available for analytics.")
 
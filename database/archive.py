@@ -0,0 +1,86 @@
+import sqlite3
+import uuid
+from pathlib import Path
+
+from database.schema import CREATE_DATE_INDEX, CREATE_TRANSACTIONS_TABLE, TRANSACTION_COLUMNS
+
+
+class ArchiveStore:
+    '''Per-year SQLite partitions holding transactions from closed years.
+
+    Each archive run writes a new, never-modified ``transactions_<year>_<id>.db``
+    file with the same schema as the live table. Which files are live is
+    recorded in the ``archive_partitions`` table of the main database, so a
+    file only becomes visible to readers when that table is committed, and
+    reads can skip every partition that does not overlap the requested range.
+    '''
+
+    def __init__(self, archive_dir, db_path):
+        self.archive_dir = Path(archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+
+    @staticmethod
+    def new_file(year):
+        '''Pick a fresh partition file name for a year'''
+        return f'transactions_{year}_{uuid.uuid4().hex[:12]}.db'
+
+    def path(self, file):
+        return self.archive_dir / file
+
+    def get_connection(self, file):
+        # Read-only, so a partition that has gone missing raises instead of
+        # being recreated empty
+        return sqlite3.connect(f'file:{self.path(file)}?mode=ro', uri=True)
+
+    @staticmethod
+    def partitions(conn, start_date=None, end_date=None):
+        '''List registered (year, file) pairs overlapping [start_date, end_date]'''
+        start_year = int(str(start_date)[:4]) if start_date else None
+        end_year = int(str(end_date)[:4]) if end_date else None
+        rows = conn.execute('SELECT year, file FROM archive_partitions ORDER BY year, file').fetchall()
+        return [
+            (year, file) for year, file in rows
+            if (start_year is None or year >= start_year)
+            and (end_year is None or year <= end_year)
+        ]
+
+    def years(self):
+        '''List archived years, oldest first'''
+        conn = sqlite3.connect(self.db_path)
+        years = sorted({year for year, _ in self.partitions(conn)})
+        conn.close()
+        return years
+
+    def write_partition(self, year, rows):
+        '''Write rows to a new partition file and return its file name.
+
+        The file is built under a temporary name and renamed into place, so
+        a half-written partition is never left under a partition name.
+        '''
+        file = self.new_file(year)
+        tmp_path = self.archive_dir / f'.{file}.tmp'
+        conn = sqlite3.connect(tmp_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(CREATE_TRANSACTIONS_TABLE)
+            cursor.execute(CREATE_DATE_INDEX)
+            placeholders = ', '.join('?' for _ in TRANSACTION_COLUMNS)
+            cursor.executemany(
+                f"INSERT INTO transactions ({', '.join(TRANSACTION_COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                rows
+            )
+            conn.commit()
+        except Exception:
+            conn.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        conn.close()
+        tmp_path.replace(self.path(file))
+        return file
+
+    def remove(self, files):
+        '''Delete partition files, ignoring ones already gone'''
+        for file in files:
+            self.path(file).unlink(missing_ok=True)
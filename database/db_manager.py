@@ -1,7 +1,17 @@
+import json
+import shutil
 import sqlite3
+import tempfile
 from datetime import datetime
 import pandas as pd
 from pathlib import Path
+from database.archive import ArchiveStore
+from database.schema import (
+    CREATE_ARCHIVE_PARTITIONS_TABLE, CREATE_DATE_INDEX, CREATE_TRANSACTIONS_TABLE, TRANSACTION_COLUMNS
+)
+from database.write_queue import get_write_queue
+
+MANIFEST_NAME = 'manifest.json'
 
 class DatabaseManager:
     def __init__(self, db_path='data/finance.db'):
@@ -9,6 +19,10 @@ class DatabaseManager:
         # Create data directory if it doesn't exist
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self.init_database()
+        # All writes go through one process-wide writer thread per database
+        self.writer = get_write_queue(db_path)
+        # Closed years are moved out of the live table into per-year partitions
+        self.archive = ArchiveStore(Path(db_path).parent / 'archive', db_path)
     
     def get_connection(self):
         return sqlite3.connect(self.db_path)
@@ -18,66 +32,307 @@ class DatabaseManager:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                category TEXT NOT NULL,
-                amount REAL NOT NULL,
-                description TEXT,
-                type TEXT NOT NULL,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        cursor.execute(CREATE_TRANSACTIONS_TABLE)
+        cursor.execute(CREATE_DATE_INDEX)
+        cursor.execute(CREATE_ARCHIVE_PARTITIONS_TABLE)
         
         conn.commit()
         conn.close()
     
     def add_transaction(self, date, category, amount, description, trans_type):
-        '''Add a new transaction'''
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        '''Add a new transaction and return its ID'''
+        def insert(cursor):
+            cursor.execute('''
+                INSERT INTO transactions (date, category, amount, description, type)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (date, category, amount, description, trans_type))
+            return cursor.lastrowid
         
-        cursor.execute('''
-            INSERT INTO transactions (date, category, amount, description, type)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (date, category, amount, description, trans_type))
+        return self.writer.execute(insert)
+    
+    @staticmethod
+    def _date_filter(start_date=None, end_date=None):
+        '''Build a WHERE fragment and params for an optional date range'''
+        clauses = []
+        params = []
+        if start_date is not None:
+            clauses.append('date >= ?')
+            params.append(str(start_date))
+        if end_date is not None:
+            clauses.append('date <= ?')
+            params.append(str(end_date))
+        return ' AND '.join(clauses), params
+    
+    def _read_partitions(self, query, params, start_date=None, end_date=None):
+        '''Run a query against the live table and every overlapping archive partition'''
+        try:
+            frames = self._read_snapshot(query, params, start_date, end_date)
+        except FileNotFoundError:
+            # A restore removed a partition our snapshot still listed; its
+            # replacement is registered by now
+            frames = self._read_snapshot(query, params, start_date, end_date)
         
-        conn.commit()
-        conn.close()
+        non_empty = [frame for frame in frames if not frame.empty]
+        if not non_empty:
+            return frames[0]
+        if len(non_empty) == 1:
+            return non_empty[0]
+        return pd.concat(non_empty, ignore_index=True)
     
-    def get_all_transactions(self):
-        '''Get all transactions as a DataFrame'''
+    def _read_snapshot(self, query, params, start_date=None, end_date=None):
+        '''Read the live table and the partitions registered in the same snapshot'''
         conn = self.get_connection()
-        df = pd.read_sql_query('SELECT * FROM transactions ORDER BY date DESC', conn)
-        conn.close()
+        try:
+            # One read transaction covers the registry and the live rows, so a
+            # year being archived is seen either live or in its partition
+            conn.execute('BEGIN')
+            partitions = self.archive.partitions(conn, start_date, end_date)
+            frames = [pd.read_sql_query(query, conn, params=params)]
+        finally:
+            conn.close()
+        
+        for _, file in partitions:
+            if not self.archive.path(file).exists():
+                raise FileNotFoundError(f"Archive partition {file} is missing")
+            conn = self.archive.get_connection(file)
+            frames.append(pd.read_sql_query(query, conn, params=params))
+            conn.close()
+        return frames
+    
+    def _select_transactions(self, start_date=None, end_date=None, columns=None):
+        '''Select transactions across partitions, newest first'''
+        columns = columns or TRANSACTION_COLUMNS
+        unknown = set(columns) - set(TRANSACTION_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown transaction columns: {sorted(unknown)}")
+        
+        where, params = self._date_filter(start_date, end_date)
+        query = f"SELECT {', '.join(columns)} FROM transactions"
+        if where:
+            query += f" WHERE {where}"
+        
+        df = self._read_partitions(query, params, start_date, end_date)
+        if 'date' in df.columns:
+            df = df.sort_values('date', ascending=False, kind='stable', ignore_index=True)
         return df
     
-    def get_transactions_by_date_range(self, start_date, end_date):
+    def get_all_transactions(self, columns=None):
+        '''Get all transactions, including archived years, as a DataFrame'''
+        return self._select_transactions(columns=columns)
+    
+    def get_transactions_by_date_range(self, start_date, end_date, columns=None):
         '''Get transactions within a date range'''
+        return self._select_transactions(start_date, end_date, columns)
+    
+    def get_transactions_since(self, last_id):
+        '''Get transactions with an ID greater than last_id'''
+        query = f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM transactions WHERE id > ?"
+        return self._read_partitions(query, [last_id])
+    
+    def count_transactions(self):
+        '''Count transactions across the live table and all archive partitions'''
+        df = self._read_partitions('SELECT COUNT(*) AS n FROM transactions', [])
+        return int(df['n'].sum())
+    
+    def get_category_totals(self, trans_type='expense', start_date=None, end_date=None):
+        '''Sum amounts by category, aggregated inside each partition'''
+        where, params = self._date_filter(start_date, end_date)
+        query = 'SELECT category, SUM(amount) AS amount FROM transactions WHERE type = ?'
+        if where:
+            query += f" AND {where}"
+        query += ' GROUP BY category'
+        
+        df = self._read_partitions(query, [trans_type] + params, start_date, end_date)
+        return df.groupby('category')['amount'].sum().sort_values(ascending=False)
+    
+    def get_monthly_totals(self, start_date=None, end_date=None):
+        '''Monthly income, expenses, and savings, aggregated inside each partition'''
+        where, params = self._date_filter(start_date, end_date)
+        query = 'SELECT substr(date, 1, 7) AS month, type, SUM(amount) AS amount FROM transactions'
+        if where:
+            query += f" WHERE {where}"
+        query += ' GROUP BY month, type'
+        
+        df = self._read_partitions(query, params, start_date, end_date)
+        if df.empty:
+            return pd.DataFrame()
+        
+        df['month'] = pd.PeriodIndex(df['month'], freq='M')
+        summary = df.groupby(['month', 'type'])['amount'].sum().unstack(fill_value=0)
+        
+        if 'income' in summary.columns and 'expense' in summary.columns:
+            summary['savings'] = summary['income'] - summary['expense']
+        
+        return summary
+    
+    def get_archivable_years(self):
+        '''Closed years that still have rows in the live table, newest first'''
         conn = self.get_connection()
-        query = '''
-            SELECT * FROM transactions 
-            WHERE date BETWEEN ? AND ?
-            ORDER BY date DESC
-        '''
-        df = pd.read_sql_query(query, conn, params=(start_date, end_date))
+        years = conn.execute(
+            'SELECT DISTINCT CAST(substr(date, 1, 4) AS INTEGER) FROM transactions '
+            'WHERE date GLOB ? AND date < ?',
+            ('[0-9][0-9][0-9][0-9]*', f'{datetime.now().year}-01-01')
+        ).fetchall()
         conn.close()
-        return df
+        return sorted((year for (year,) in years), reverse=True)
     
-    def delete_transaction(self, transaction_id):
-        '''Delete a transaction by ID'''
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
-        conn.commit()
+    def archive_year(self, year):
+        '''Move a closed year's transactions into its archive partition'''
+        year = int(year)
+        if year >= datetime.now().year:
+            raise ValueError(f"Only closed years can be archived, got {year}")
+        
+        bounds = (f'{year}-01-01', f'{year + 1}-01-01')
+        written = []
+        
+        def archive(cursor):
+            cursor.execute(
+                f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM transactions "
+                "WHERE date >= ? AND date < ?",
+                bounds
+            )
+            rows = cursor.fetchall()
+            if rows:
+                # The new file stays invisible to readers until its registry
+                # row commits together with the DELETE
+                file = self.archive.write_partition(year, rows)
+                written.append(file)
+                cursor.execute('DELETE FROM transactions WHERE date >= ? AND date < ?', bounds)
+                cursor.execute('INSERT INTO archive_partitions (file, year) VALUES (?, ?)', (file, year))
+            return len(rows)
+        
+        try:
+            return self.writer.execute(archive)
+        except Exception:
+            # Nothing was committed, so the partition was never registered
+            self.archive.remove(written)
+            raise
+    
+    def _backup_dir(self, path):
+        '''Resolve a backup folder, refusing the live data folder'''
+        path = Path(path).resolve()
+        data_dir = Path(self.db_path).parent.resolve()
+        if path == data_dir or path == self.archive.archive_dir.resolve():
+            raise ValueError(f"Backup folder must not be the live data folder ({data_dir})")
+        return path
+    
+    @staticmethod
+    def _copy_database(src_path, dest_path):
+        '''Copy a consistent snapshot of one SQLite file with the backup API'''
+        if Path(src_path).resolve() == Path(dest_path).resolve():
+            raise ValueError(f"Cannot back up {src_path} onto itself")
+        src = sqlite3.connect(src_path)
+        dest = sqlite3.connect(dest_path)
+        src.backup(dest)
+        dest.close()
+        src.close()
+    
+    def export_database(self, dest_dir):
+        '''Copy the live database and all archive partitions into dest_dir'''
+        dest_dir = self._backup_dir(dest_dir)
+        (dest_dir / 'archive').mkdir(parents=True, exist_ok=True)
+        
+        # Drop the previous export's manifest first, so an interrupted export
+        # can never be restored, and clear partitions it may have left behind
+        manifest_path = dest_dir / MANIFEST_NAME
+        manifest_path.unlink(missing_ok=True)
+        for stale in (dest_dir / 'archive').glob('transactions_*.db'):
+            stale.unlink()
+        
+        dest_path = dest_dir / Path(self.db_path).name
+        self._copy_database(self.db_path, dest_path)
+        
+        # The copied registry lists exactly the partitions that go with the
+        # copied live rows; partition files never change once registered
+        conn = sqlite3.connect(dest_path)
+        partitions = self.archive.partitions(conn)
         conn.close()
-
-    def update_transaction_details(self, transaction_id, new_details):
-        '''Update transaction details'''
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        for _, file in partitions:
+            self._copy_database(self.archive.path(file), dest_dir / 'archive' / file)
+        
+        manifest_path.write_text(json.dumps({
+            'database': Path(self.db_path).name,
+            'partitions': [{'file': f'archive/{file}', 'year': year} for year, file in partitions],
+        }, indent=2))
+        return dest_dir
+    
+    def restore_database(self, src_dir):
+        '''Replace all transactions with an export made by export_database'''
+        src_dir = self._backup_dir(src_dir)
+        manifest_path = src_dir / MANIFEST_NAME
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"No export manifest at {manifest_path}")
+        
+        # Only files listed in the manifest belong to this export
+        manifest = json.loads(manifest_path.read_text())
+        src_path = src_dir / manifest['database']
+        partitions = [(entry['year'], src_dir / entry['file']) for entry in manifest['partitions']]
+        for path in [src_path] + [path for _, path in partitions]:
+            if not path.exists():
+                raise FileNotFoundError(f"Export is missing {path}")
+        
+        conn = sqlite3.connect(src_path)
+        rows = conn.execute(f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM transactions").fetchall()
+        conn.close()
+        
+        # Stage partitions under fresh names next to the live archive; they
+        # are only registered in the same transaction that restores the rows
+        staging = Path(tempfile.mkdtemp(prefix='restore-', dir=Path(self.db_path).parent))
+        staged = []
+        moved = []
+        try:
+            max_id = max((row[0] for row in rows), default=0)
+            for year, path in partitions:
+                file = self.archive.new_file(year)
+                self._copy_database(path, staging / file)
+                conn = sqlite3.connect(staging / file)
+                max_id = max(max_id, conn.execute('SELECT COALESCE(MAX(id), 0) FROM transactions').fetchone()[0])
+                conn.close()
+                staged.append((file, year))
+            
+            def restore(cursor):
+                replaced = [file for _, file in self.archive.partitions(cursor)]
+                cursor.execute('DELETE FROM transactions')
+                placeholders = ', '.join('?' for _ in TRANSACTION_COLUMNS)
+                cursor.executemany(
+                    f"INSERT INTO transactions ({', '.join(TRANSACTION_COLUMNS)}) "
+                    f"VALUES ({placeholders})",
+                    rows
+                )
+                # New IDs must also skip past the ones held by archived partitions
+                cursor.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'transactions'", (max_id,))
+                if cursor.rowcount == 0:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('transactions', ?)", (max_id,))
+                
+                cursor.execute('DELETE FROM archive_partitions')
+                cursor.executemany('INSERT INTO archive_partitions (file, year) VALUES (?, ?)', staged)
+                for file, _ in staged:
+                    (staging / file).replace(self.archive.path(file))
+                    moved.append(file)
+                return len(rows), replaced
+            
+            restored, replaced = self.writer.execute(restore)
+        except Exception:
+            # Nothing was committed, so none of the moved files are registered
+            self.archive.remove(moved)
+            raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
         
+        # Readers holding an older snapshot retry when these disappear
+        self.archive.remove(replaced)
+        return restored
+    
+    def delete_transaction(self, transaction_id):
+        '''Delete a transaction by ID, returning the number of rows removed'''
+        def delete(cursor):
+            cursor.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
+            return cursor.rowcount
+        
+        return self.writer.execute(delete)
+    
+    def update_transaction_details(self, transaction_id, new_details):
+        '''Update transaction details, returning the number of rows changed'''
         fields = []
         values = []
         for key, value in new_details.items():
@@ -86,7 +341,9 @@ class DatabaseManager:
         values.append(transaction_id)
         
         query = f"UPDATE transactions SET {', '.join(fields)} WHERE id = ?"
-        cursor.execute(query, values)
         
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        def update(cursor):
+            cursor.execute(query, values)
+            return cursor.rowcount
+        
+        return self.writer.execute(update)
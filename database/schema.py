@@ -0,0 +1,26 @@
+TRANSACTION_COLUMNS = ['id', 'date', 'category', 'amount', 'description', 'type', 'created_at']
+
+CREATE_TRANSACTIONS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        category TEXT NOT NULL,
+        amount REAL NOT NULL,
+        description TEXT,
+        type TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+CREATE_DATE_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)
+'''
+
+# Registry of archive partition files; updated in the same transaction that
+# moves rows out of the live table, so readers see either one or the other
+CREATE_ARCHIVE_PARTITIONS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS archive_partitions (
+        file TEXT PRIMARY KEY,
+        year INTEGER NOT NULL
+    )
+'''
@@ -0,0 +1,163 @@
+'''Concurrency stress harness for transaction writes.
+
+Simulates many Streamlit sessions writing to one temporary database and
+reports throughput and lock errors. Run with:
+
+    python -m database.stress_test --sessions 32 --ops 200
+    python -m database.stress_test --direct   # one connection per write, for comparison
+    python -m database.stress_test --synchronous NORMAL
+'''
+import argparse
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from database.schema import CREATE_TRANSACTIONS_TABLE
+from database.write_queue import SYNCHRONOUS_LEVELS, WriteQueue
+
+INSERT = '''
+    INSERT INTO transactions (date, category, amount, description, type)
+    VALUES (?, ?, ?, ?, ?)
+'''
+UPDATE = 'UPDATE transactions SET amount = ?, description = ? WHERE id = ?'
+DELETE = 'DELETE FROM transactions WHERE id = ?'
+
+
+class DirectWriter:
+    '''Baseline writer that opens and commits its own connection per call'''
+
+    def __init__(self, db_path, synchronous='FULL'):
+        self.db_path = db_path
+        self.synchronous = synchronous
+
+    def execute(self, operation):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            result = operation(conn.cursor())
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+
+    def close(self):
+        pass
+
+
+def _random_operation(rng, own_ids):
+    '''Pick an add/update/delete for one simulated session'''
+    roll = rng.random()
+    if own_ids and roll < 0.2:
+        sql, params = DELETE, (own_ids.pop(rng.randrange(len(own_ids))),)
+    elif own_ids and roll < 0.4:
+        sql, params = UPDATE, (round(rng.uniform(1, 500), 2), 'updated', rng.choice(own_ids))
+    else:
+        sql, params = INSERT, (
+            f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            rng.choice(['Groceries', 'Utilities', 'Dining Out', 'Salary']),
+            round(rng.uniform(1, 500), 2),
+            'stress test',
+            rng.choice(['expense', 'income']),
+        )
+
+    def operation(cursor):
+        cursor.execute(sql, params)
+        return cursor.lastrowid if sql is INSERT else None
+
+    return operation
+
+
+def _session(writer, ops, seed, stats, stats_lock):
+    rng = random.Random(seed)
+    own_ids = []
+    completed = lock_errors = other_errors = 0
+    for _ in range(ops):
+        operation = _random_operation(rng, own_ids)
+        try:
+            transaction_id = writer.execute(operation)
+            if transaction_id is not None:
+                own_ids.append(transaction_id)
+            completed += 1
+        except sqlite3.OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                lock_errors += 1
+            else:
+                other_errors += 1
+        except Exception:
+            other_errors += 1
+    with stats_lock:
+        stats['completed'] += completed
+        stats['lock_errors'] += lock_errors
+        stats['other_errors'] += other_errors
+
+
+def run_stress_test(sessions=16, ops=100, direct=False, max_batch_size=64, synchronous='FULL'):
+    '''Run concurrent sessions against a database and return a stats dict'''
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'stress.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute(CREATE_TRANSACTIONS_TABLE)
+        conn.commit()
+        conn.close()
+
+        if direct:
+            writer = DirectWriter(db_path, synchronous=synchronous)
+        else:
+            writer = WriteQueue(db_path, max_batch_size=max_batch_size, synchronous=synchronous)
+
+        stats = {'completed': 0, 'lock_errors': 0, 'other_errors': 0}
+        stats_lock = threading.Lock()
+        threads = [
+            threading.Thread(target=_session, args=(writer, ops, seed, stats, stats_lock))
+            for seed in range(sessions)
+        ]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.close()
+        elapsed = time.perf_counter() - start
+
+    stats['sessions'] = sessions
+    stats['synchronous'] = synchronous
+    stats['elapsed'] = elapsed
+    stats['throughput'] = stats['completed'] / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=16, help='concurrent simulated sessions')
+    parser.add_argument('--ops', type=int, default=100, help='writes per session')
+    parser.add_argument('--direct', action='store_true',
+                        help='open a connection per write instead of using the writer thread')
+    parser.add_argument('--batch-size', type=int, default=64, help='max operations per commit')
+    parser.add_argument('--synchronous', type=str.upper, choices=SYNCHRONOUS_LEVELS, default='FULL',
+                        help='SQLite synchronous level for the writer (default FULL)')
+    args = parser.parse_args()
+
+    stats = run_stress_test(
+        sessions=args.sessions,
+        ops=args.ops,
+        direct=args.direct,
+        max_batch_size=args.batch_size,
+        synchronous=args.synchronous,
+    )
+    mode = 'direct connections' if args.direct else 'write queue'
+    print(f"Mode:          {mode}")
+    print(f"Synchronous:   {stats['synchronous']}")
+    print(f"Sessions:      {stats['sessions']}")
+    print(f"Completed:     {stats['completed']}")
+    print(f"Lock errors:   {stats['lock_errors']}")
+    print(f"Other errors:  {stats['other_errors']}")
+    print(f"Elapsed:       {stats['elapsed']:.2f}s")
+    print(f"Throughput:    {stats['throughput']:,.0f} writes/s")
+
+
+if __name__ == '__main__':
+    main()
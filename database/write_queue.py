@@ -0,0 +1,191 @@
+import atexit
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+_STOP = object()
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+class WriteQueue:
+    '''Single writer thread that owns the only write connection to a database.
+
+    Callers submit operations (callables taking a cursor) and get back a
+    Future. The writer takes whatever is already queued (up to
+    ``max_batch_size`` operations) and commits it in one transaction, so
+    writes that pile up while a commit is in flight share the next fsync
+    instead of fighting over the database lock. A lone writer never waits.
+
+    ``synchronous`` is SQLite's durability setting for the writer connection.
+    The default FULL syncs the WAL on every commit, so a committed write
+    survives power loss; NORMAL is faster but can lose the last commits.
+    '''
+
+    def __init__(self, db_path, max_batch_size=64, synchronous='FULL'):
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"synchronous must be one of {SYNCHRONOUS_LEVELS}, got {synchronous!r}")
+        self.db_path = db_path
+        self.max_batch_size = max_batch_size
+        self.synchronous = synchronous
+        self._queue = queue.Queue()
+        self._closed = False
+        self._error = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name=f'sqlite-writer:{db_path}', daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, operation):
+        '''Queue a write operation and return a Future for its result'''
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('WriteQueue is closed') from self._error
+            self._queue.put((operation, future))
+        return future
+
+    def execute(self, operation, timeout=None):
+        '''Queue a write operation and block until it has been committed.
+
+        Raises concurrent.futures.TimeoutError if it is not done within
+        ``timeout`` seconds; the operation may still run afterwards.
+        '''
+        return self.submit(operation).result(timeout)
+
+    @property
+    def closed(self):
+        '''True once the writer is stopped or has died'''
+        return self._closed
+
+    def close(self):
+        '''Flush pending writes and stop the writer thread'''
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        # WAL lets readers on other connections proceed while a batch commits
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        return conn
+
+    def _next_batch(self, first):
+        '''Collect already-queued operations until the batch is full or the queue is empty'''
+        batch = [first]
+        while len(batch) < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit_batch(self, conn, batch):
+        '''Run a batch in one transaction, isolating failures with savepoints'''
+        outcomes = []
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for operation, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    outcomes.append(None)
+                    continue
+                cursor.execute('SAVEPOINT op')
+                try:
+                    outcomes.append((True, operation(cursor)))
+                    cursor.execute('RELEASE op')
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO op')
+                    cursor.execute('RELEASE op')
+                    outcomes.append((False, e))
+            cursor.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            self._fail_futures(batch, e)
+            return
+
+        for (_, future), outcome in zip(batch, outcomes):
+            if outcome is None:
+                continue
+            ok, value = outcome
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    @staticmethod
+    def _fail_futures(items, error):
+        for _, future in items:
+            if future.done():
+                continue
+            if future.running() or future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def _run(self):
+        batch = []
+        try:
+            conn = self._connect()
+            try:
+                stopping = False
+                while not stopping:
+                    item = self._queue.get()
+                    if item is _STOP:
+                        break
+                    batch, stopping = self._next_batch(item)
+                    self._commit_batch(conn, batch)
+                    batch = []
+            finally:
+                conn.close()
+        except BaseException as e:
+            self._die(e, batch)
+
+    def _die(self, error, batch):
+        '''Stop accepting work and fail everything still waiting on the writer'''
+        with self._lock:
+            self._closed = True
+            self._error = error
+        pending = list(batch)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                pending.append(item)
+        self._fail_futures(pending, error)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_write_queue(db_path):
+    '''Return the process-wide WriteQueue for a database, (re)starting it if needed'''
+    key = str(Path(db_path).resolve())
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None or writer.closed:
+            writer = WriteQueue(db_path)
+            _writers[key] = writer
+        return writer
+
+
+@atexit.register
+def close_all_write_queues():
+    '''Flush and stop every process-wide writer'''
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
@@ -0,0 +1,117 @@
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from database.db_manager import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / 'data' / 'finance.db'))
+
+
+def add_years(db, years, per_year=4):
+    for year in years:
+        for month in range(1, per_year + 1):
+            db.add_transaction(f'{year}-{month:02d}-01', 'Groceries', 10.0, 'Store', 'expense')
+
+
+def test_reexport_does_not_keep_stale_partitions(db, tmp_path):
+    add_years(db, [2022, 2023])
+    db.export_database(tmp_path / 'old')
+    db.archive_year(2022)
+    db.export_database(tmp_path / 'backup')
+    db.restore_database(tmp_path / 'old')
+    db.export_database(tmp_path / 'backup')
+    db.restore_database(tmp_path / 'backup')
+
+    assert db.count_transactions() == 8
+    assert db.archive.years() == []
+
+
+def test_restore_ignores_files_not_in_manifest(db, tmp_path):
+    add_years(db, [2022])
+    backup = db.export_database(tmp_path / 'backup')
+    manifest = json.loads((backup / 'manifest.json').read_text())
+    assert manifest['partitions'] == []
+
+    other = DatabaseManager(str(tmp_path / 'other' / 'finance.db'))
+    add_years(other, [2023])
+    other.archive_year(2023)
+    for path in other.archive.archive_dir.glob('transactions_*.db'):
+        other._copy_database(path, backup / 'archive' / path.name)
+
+    db.restore_database(backup)
+    assert db.count_transactions() == 4
+    assert db.archive.years() == []
+
+
+def test_restore_requires_manifest(db, tmp_path):
+    (tmp_path / 'empty').mkdir()
+    with pytest.raises(FileNotFoundError):
+        db.restore_database(tmp_path / 'empty')
+
+
+def totals(db):
+    return db.count_transactions(), db.get_category_totals()['Groceries']
+
+
+def test_archive_is_invisible_until_committed(db, monkeypatch):
+    add_years(db, [2022, 2023])
+    seen = []
+    write_partition = db.archive.write_partition
+
+    def write_and_read(year, rows):
+        file = write_partition(year, rows)
+        # The partition file exists but the move has not committed yet
+        seen.append(totals(db))
+        return file
+
+    monkeypatch.setattr(db.archive, 'write_partition', write_and_read)
+    assert db.archive_year(2022) == 4
+    assert seen == [(8, 80.0)]
+    assert totals(db) == (8, 80.0)
+
+
+def test_failed_archive_leaves_rows_live_only(db):
+    add_years(db, [2022])
+    conn = db.get_connection()
+    conn.execute(
+        "CREATE TRIGGER fail_delete BEFORE DELETE ON transactions "
+        "BEGIN SELECT RAISE(ABORT, 'delete failed'); END"
+    )
+    conn.commit()
+    conn.close()
+
+    with pytest.raises(sqlite3.DatabaseError):
+        db.archive_year(2022)
+
+    assert totals(db) == (4, 40.0)
+    assert db.archive.years() == []
+    assert list(db.archive.archive_dir.glob('transactions_*.db')) == []
+
+
+def test_concurrent_reads_never_double_count(db):
+    add_years(db, range(2000, 2020), per_year=12)
+    expected = totals(db)
+    seen = set()
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            seen.add(totals(db))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for year in range(2000, 2020):
+            db.archive_year(year)
+    finally:
+        done.set()
+        reader.join()
+
+    assert seen == {expected}
+    assert totals(db) == expected
+    assert db.archive.years() == list(range(2000, 2020))
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from utils.pattern_detector import PatternDetector
+
+
+def bills(description, amount, months, start_id=1, category='Utilities', first_month='2023-01'):
+    dates = pd.date_range(f'{first_month}-01', periods=months, freq='MS') + pd.Timedelta(days=4)
+    return pd.DataFrame({
+        'id': np.arange(start_id, start_id + months),
+        'date': dates.strftime('%Y-%m-%d'),
+        'category': category,
+        'amount': amount,
+        'description': description,
+        'type': 'expense',
+    })
+
+
+def detect(*batches):
+    detector = PatternDetector()
+    for batch in batches:
+        detector.update(batch)
+    return detector
+
+
+def test_batches_cluster_like_a_full_recompute():
+    # One monthly bill whose amount drops each quarter
+    a = bills('CITY POWER', 10.90, 3, start_id=1, first_month='2023-01')
+    b = bills('CITY POWER', 10.00, 3, start_id=4, first_month='2023-04')
+    c = bills('CITY POWER', 9.20, 3, start_id=7, first_month='2023-07')
+
+    incremental = detect(a, b, c)
+    full = detect(pd.concat([a, b, c], ignore_index=True))
+
+    tm.assert_frame_equal(incremental.recurring(), full.recurring())
+    clusters = full._clusters.sort_values('anchor')
+    assert clusters['occurrences'].tolist() == [6, 3]
+    assert clusters['anchor'].tolist() == [9.2, 10.9]
+
+
+def test_update_in_batches_matches_single_update():
+    rng = np.random.default_rng(0)
+    n = 2000
+    rows = pd.DataFrame({
+        'id': np.arange(1, n + 1),
+        'date': (pd.Timestamp('2022-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 730, n)), unit='D'))
+        .strftime('%Y-%m-%d'),
+        'category': rng.choice(['Groceries', 'Utilities', 'Dining Out'], n),
+        'amount': np.round(rng.gamma(2, 20, n), 2),
+        'description': rng.choice(['Corner Shop', 'City Power', 'Taco Stand', 'Bookstore'], n),
+        'type': 'expense',
+    })
+    rows = pd.concat([rows, bills('NETFLIX.COM', 15.99, 24, start_id=n + 1, category='Entertainment')])
+    rows = rows.sort_values(['date', 'id'], ignore_index=True)
+    a, b = rows.iloc[:1300], rows.iloc[1300:]
+
+    incremental = detect(a, b)
+    full = detect(rows)
+
+    tm.assert_frame_equal(incremental.recurring(), full.recurring())
+    tm.assert_frame_equal(incremental.anomalies(), full.anomalies())
+    assert 'NETFLIX.COM' in full.recurring()['description'].tolist()
+
+
+def test_next_expected_follows_the_calendar():
+    rent = bills('Landlord', 1200.0, 4, category='Housing', first_month='2023-11')
+    recurring = detect(rent).recurring()
+
+    assert recurring['period'].tolist() == ['monthly']
+    assert str(recurring['last_date'][0]) == '2024-02-05'
+    assert str(recurring['next_expected'][0]) == '2024-03-05'
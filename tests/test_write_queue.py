@@ -0,0 +1,131 @@
+import sqlite3
+import threading
+
+import pytest
+
+from database.schema import CREATE_TRANSACTIONS_TABLE
+from database.write_queue import WriteQueue, get_write_queue
+
+
+class WriterCrash(BaseException):
+    '''Escapes the per-operation handler and kills the writer thread'''
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'finance.db')
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_TRANSACTIONS_TABLE)
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def writer(db_path):
+    writer = WriteQueue(db_path)
+    yield writer
+    writer.close()
+
+
+def insert(description):
+    def operation(cursor):
+        cursor.execute(
+            "INSERT INTO transactions (date, category, amount, description, type) "
+            "VALUES ('2024-01-01', 'Groceries', 10.0, ?, 'expense')",
+            (description,)
+        )
+        return cursor.lastrowid
+    return operation
+
+
+def fail_after_insert(cursor):
+    insert('rolled back')(cursor)
+    raise ValueError('bad row')
+
+
+def crash(cursor):
+    raise WriterCrash()
+
+
+def hold(writer):
+    '''Occupy the writer so the next submissions queue up behind it'''
+    started = threading.Event()
+    release = threading.Event()
+
+    def wait(cursor):
+        started.set()
+        release.wait(5)
+
+    future = writer.submit(wait)
+    assert started.wait(5)
+    return release, future
+
+
+def descriptions(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT description FROM transactions ORDER BY id').fetchall()
+    conn.close()
+    return [description for (description,) in rows]
+
+
+def test_failed_operation_does_not_fail_its_batch(writer, db_path):
+    release, held = hold(writer)
+    futures = [writer.submit(insert('first')), writer.submit(fail_after_insert), writer.submit(insert('last'))]
+    release.set()
+
+    assert held.result(5) is None
+    assert futures[0].result(5) > 0
+    with pytest.raises(ValueError, match='bad row'):
+        futures[1].result(5)
+    assert futures[2].result(5) > 0
+    assert descriptions(db_path) == ['first', 'last']
+
+
+def test_cancelled_operation_never_runs(writer, db_path):
+    release, _ = hold(writer)
+    cancelled = writer.submit(insert('cancelled'))
+    kept = writer.submit(insert('kept'))
+    assert cancelled.cancel()
+    release.set()
+
+    assert kept.result(5) > 0
+    assert cancelled.cancelled()
+    assert descriptions(db_path) == ['kept']
+
+
+def test_pending_futures_fail_when_writer_dies(db_path):
+    writer = WriteQueue(db_path, max_batch_size=1)
+    release, _ = hold(writer)
+    crashed = writer.submit(crash)
+    pending = [writer.submit(insert(f'pending {i}')) for i in range(3)]
+    release.set()
+
+    for future in [crashed] + pending:
+        with pytest.raises(WriterCrash):
+            future.result(5)
+    assert writer.closed
+    with pytest.raises(RuntimeError, match='closed'):
+        writer.submit(insert('late'))
+    assert descriptions(db_path) == []
+
+
+def test_get_write_queue_replaces_dead_writer(db_path):
+    writer = get_write_queue(db_path)
+    with pytest.raises(WriterCrash):
+        writer.execute(crash, timeout=5)
+    assert writer.closed
+
+    replacement = get_write_queue(db_path)
+    try:
+        assert replacement is not writer
+        assert replacement.execute(insert('after restart'), timeout=5) > 0
+        assert get_write_queue(db_path) is replacement
+    finally:
+        replacement.close()
+    assert descriptions(db_path) == ['after restart']
+
+
+def test_synchronous_level_is_validated(db_path):
+    with pytest.raises(ValueError):
+        WriteQueue(db_path, synchronous='SOMETIMES')
@@ -0,0 +1,331 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# Expected gap in days for each recurring period
+PERIODS = {
+    'weekly': 7,
+    'biweekly': 14,
+    'monthly': 30.44,
+    'quarterly': 91.31,
+    'yearly': 365.25,
+}
+# Periods that follow the calendar, in months, when projecting the next date
+CALENDAR_PERIODS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+PERIOD_TOLERANCE = 0.15     # gap may differ from the period by this fraction
+AMOUNT_TOLERANCE = 0.10     # amounts within 10% of a cluster's anchor amount join it
+MIN_OCCURRENCES = 3
+MIN_REGULARITY = 0.75       # share of gaps that must match the dominant period
+
+ANOMALY_WINDOW = 30         # previous charges per category used for rolling stats
+ANOMALY_MIN_HISTORY = 5
+ANOMALY_Z_THRESHOLD = 3.0
+ANOMALY_MIN_STD = 0.10      # log-amount std floor, so flat histories still flag jumps
+
+TAIL_COLUMNS = ['id', 'date', 'category', 'amount', 'description']
+ROW_COLUMNS = ['id', 'date', 'amount', 'description', 'type', 'category', 'group']
+
+
+def factorize_descriptions(descriptions):
+    '''Factorize descriptions reduced to lowercase words ("NETFLIX.COM 0042" -> "netflix com")'''
+    raw_codes, raw_uniques = pd.factorize(descriptions.fillna('').astype(str))
+    normalized = (
+        pd.Series(raw_uniques, dtype=object)
+        .str.lower()
+        .str.replace(r'[^a-z ]+', ' ', regex=True)
+        .str.replace(r'\s+', ' ', regex=True)
+        .str.strip()
+    )
+    # Normalization only runs on distinct strings; rows just remap codes
+    codes, uniques = pd.factorize(normalized)
+    return codes[raw_codes], np.asarray(uniques, dtype=object)
+
+
+def classify_gaps(gaps):
+    '''Map inter-arrival gaps in days to an index into PERIODS, or -1 when irregular'''
+    gaps = np.asarray(gaps, dtype=float)
+    conditions = [
+        np.abs(gaps - days) <= days * PERIOD_TOLERANCE for days in PERIODS.values()
+    ]
+    return np.select(conditions, np.arange(len(PERIODS)), default=-1)
+
+
+class PatternDetector:
+    '''Incremental recurring-payment and anomaly detection over the ledger.
+
+    Recurring payments are grouped by type, category and normalized
+    description, then clustered by amount: the smallest amount in a group
+    anchors a cluster holding every amount within AMOUNT_TOLERANCE above it,
+    and the next amount past that anchors the next cluster. Each cluster
+    counts how many of its inter-arrival gaps match each period in PERIODS.
+    New rows only re-cluster the groups they belong to. Anomalies are
+    expenses more than ANOMALY_Z_THRESHOLD standard deviations above the
+    rolling mean (of log amounts) of the previous ANOMALY_WINDOW charges in
+    the same category; only the tail of each category is kept between
+    updates.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def reset(self):
+        '''Drop all state so the next refresh recomputes from scratch'''
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.last_id = 0
+        self.row_count = 0
+        self.latest_date = pd.NaT
+        self._groups = pd.Index([], dtype=object)
+        self._rows = pd.DataFrame()
+        self._clusters = pd.DataFrame()
+        self._tail = pd.DataFrame()
+        self._anomalies = pd.DataFrame()
+        self._recurring = None
+
+    def refresh(self, db_manager):
+        '''Fold rows inserted since the last refresh into the cached results'''
+        with self._lock:
+            new_rows = db_manager.get_transactions_since(self.last_id)
+            row_count = db_manager.count_transactions()
+
+            # Deleted or backdated rows invalidate the running state, so fall
+            # back to a full recompute
+            stale = self.row_count + len(new_rows) != row_count
+            if not stale and not new_rows.empty and pd.notna(self.latest_date):
+                stale = pd.to_datetime(new_rows['date'], errors='coerce').min() < self.latest_date
+            if stale:
+                self._reset()
+                new_rows = db_manager.get_all_transactions()
+
+            self._update(new_rows)
+            if not new_rows.empty:
+                self.row_count += len(new_rows)
+                self.last_id = max(self.last_id, int(new_rows['id'].max()))
+
+    def update(self, new_rows):
+        '''Update clusters and anomaly scores with new transactions'''
+        with self._lock:
+            self._update(new_rows)
+
+    def _update(self, new_rows):
+        if new_rows.empty:
+            return
+
+        df = new_rows[['id', 'date', 'category', 'amount', 'description', 'type']].copy()
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df = df.dropna(subset=['date', 'amount'])
+        if df.empty:
+            return
+
+        self._update_clusters(df)
+        self._update_anomalies(df[df['type'] == 'expense'])
+        latest = df['date'].max()
+        self.latest_date = latest if pd.isna(self.latest_date) else max(self.latest_date, latest)
+        self._recurring = None
+
+    def _group_ids(self, df):
+        '''Map rows to stable integer ids of their type|category|description group'''
+        type_codes, type_uniques = pd.factorize(df['type'])
+        category_codes, category_uniques = pd.factorize(df['category'])
+        merchant_codes, merchant_uniques = factorize_descriptions(df['description'])
+
+        # One integer code per group in this batch (mixed-radix over the key
+        # parts), so string keys are only built once per group
+        composite = (
+            type_codes.astype(np.int64) * len(category_uniques) + category_codes
+        ) * len(merchant_uniques) + merchant_codes
+        groups, group_uniques = pd.factorize(composite)
+        rest, merchant_part = np.divmod(group_uniques, len(merchant_uniques))
+        type_part, category_part = np.divmod(rest, len(category_uniques))
+        keys = pd.Index(
+            pd.Series(type_uniques.to_numpy()[type_part], dtype=object) + '|'
+            + category_uniques.to_numpy()[category_part] + '|'
+            + merchant_uniques[merchant_part]
+        )
+
+        new_keys = keys.difference(self._groups)
+        if len(new_keys):
+            self._groups = self._groups.append(new_keys)
+        return self._groups.get_indexer(keys)[groups]
+
+    def _assign_clusters(self, rows):
+        '''Cluster every row of the given groups by amount; returns each row's cluster
+        code and a frame of cluster attributes indexed by cluster key'''
+        groups, group_ids = pd.factorize(rows['group'])
+        group_keys = self._groups.to_numpy()[group_ids]
+        first_rows = np.unique(groups, return_index=True)[1]
+        group_types = rows['type'].to_numpy()[first_rows]
+        group_categories = rows['category'].to_numpy()[first_rows]
+
+        # Within each group, sorted by amount, the smallest unassigned amount
+        # anchors a cluster that takes every amount up to tolerance above it.
+        # Only cluster starts are walked.
+        log_amount = np.log(rows['amount'].clip(lower=0.01).to_numpy(dtype=float))
+        tolerance = np.log1p(AMOUNT_TOLERANCE)
+        order = np.lexsort((log_amount, groups))
+        sorted_groups = groups[order]
+        sorted_amounts = log_amount[order]
+
+        # Groups are laid out on one axis, spaced further apart than the
+        # tolerance, so a single searchsorted never crosses into the next group
+        offset = sorted_amounts.min()
+        spacing = sorted_amounts.max() - offset + 2 * tolerance
+        position = sorted_groups * spacing + (sorted_amounts - offset)
+        group_ends = np.r_[np.flatnonzero(sorted_groups[1:] != sorted_groups[:-1]) + 1, len(order)]
+        row_group_end = np.repeat(group_ends, np.diff(np.r_[0, group_ends]))
+
+        is_start = np.zeros(len(order), dtype=bool)
+        starts = np.r_[0, group_ends[:-1]]
+        while starts.size:
+            is_start[starts] = True
+            following = np.searchsorted(position, position[starts] + tolerance, side='right')
+            starts = following[following < row_group_end[starts]]
+
+        codes = np.empty(len(order), dtype=np.int64)
+        codes[order] = np.cumsum(is_start) - 1
+        start_rows = np.flatnonzero(is_start)
+        start_groups = sorted_groups[start_rows]
+        anchor_amounts = np.round(np.exp(sorted_amounts[start_rows]), 2)
+        info = pd.DataFrame({
+            'type': group_types[start_groups],
+            'category': group_categories[start_groups],
+            'group': group_ids[start_groups],
+            'anchor': anchor_amounts,
+        }, index=group_keys[start_groups] + '|' + anchor_amounts.astype(str))
+        return codes, info
+
+    def _update_clusters(self, df):
+        # Clustering depends on every amount in a group, so the groups these
+        # rows touch are re-clustered from all of their rows; the result is
+        # the same whatever batches the rows arrived in
+        df = df.assign(group=self._group_ids(df))[ROW_COLUMNS]
+        touched = pd.unique(df['group'])
+        if self._rows.empty:
+            rows = df
+            self._rows = df
+        else:
+            previous = self._rows['group'].isin(touched).to_numpy()
+            rows = pd.concat([self._rows[previous], df], ignore_index=True)
+            self._rows = pd.concat([self._rows, df], ignore_index=True)
+
+        codes, info = self._assign_clusters(rows)
+
+        # Sort by cluster, then date, so each cluster is one contiguous run
+        dates = rows['date'].to_numpy()
+        order = np.lexsort((rows['id'].to_numpy(), dates, codes))
+        codes = codes[order]
+        dates = dates[order]
+        amounts = rows['amount'].to_numpy(dtype=float)[order]
+        descriptions = rows['description'].to_numpy()[order]
+
+        # Gap to the previous occurrence within the cluster
+        first = np.r_[True, codes[1:] != codes[:-1]]
+        prev_date = np.r_[np.datetime64('NaT', 'ns'), dates[:-1]].astype(dates.dtype)
+        prev_date[first] = np.datetime64('NaT')
+        gaps = (dates - prev_date) / np.timedelta64(1, 'D')
+        has_gap = ~np.isnan(gaps)
+        periods = classify_gaps(gaps)
+
+        n_clusters = len(info)
+        last = np.r_[np.flatnonzero(first[1:]), len(codes) - 1]
+        batch = info.assign(
+            description=descriptions[last],
+            occurrences=np.bincount(codes, minlength=n_clusters),
+            amount_sum=np.bincount(codes, weights=amounts, minlength=n_clusters),
+            gap_count=np.bincount(codes[has_gap], minlength=n_clusters),
+            last_date=dates[last],
+        )
+        for i, name in enumerate(PERIODS):
+            batch[name] = np.bincount(codes[periods == i], minlength=n_clusters)
+
+        if not self._clusters.empty:
+            untouched = ~self._clusters['group'].isin(touched).to_numpy()
+            batch = pd.concat([self._clusters[untouched], batch])
+        self._clusters = batch
+
+    def _update_anomalies(self, expenses):
+        if expenses.empty:
+            return
+
+        frames = [expenses[TAIL_COLUMNS].assign(is_new=True)]
+        if not self._tail.empty:
+            frames.insert(0, self._tail.assign(is_new=False))
+        combined = pd.concat(frames, ignore_index=True)
+        group, _ = pd.factorize(combined['category'])
+        order = np.lexsort((combined['id'].to_numpy(), combined['date'].to_numpy(), group))
+        combined = combined.iloc[order].reset_index(drop=True)
+        group = group[order]
+
+        # Spending is right-skewed, so score log amounts against rolling stats
+        # of the charges before each row, never including the row itself
+        log_amount = np.log1p(combined['amount'].astype(float).clip(lower=0))
+        previous = log_amount.groupby(group, sort=False).shift()
+        rolling = previous.groupby(group, sort=False).rolling(
+            ANOMALY_WINDOW, min_periods=ANOMALY_MIN_HISTORY
+        )
+        mean = rolling.mean().droplevel(0).sort_index()
+        std = rolling.std().droplevel(0).sort_index().clip(lower=ANOMALY_MIN_STD)
+
+        combined['typical_amount'] = np.expm1(mean)
+        combined['z_score'] = (log_amount - mean) / std
+        flagged = combined[combined['is_new'] & (combined['z_score'] > ANOMALY_Z_THRESHOLD)]
+        if not flagged.empty:
+            self._anomalies = pd.concat(
+                [self._anomalies, flagged.drop(columns='is_new')], ignore_index=True
+            )
+
+        self._tail = combined.groupby(group, sort=False).tail(ANOMALY_WINDOW)[TAIL_COLUMNS]
+
+    def recurring(self):
+        '''Recurring payments with their period and next expected date'''
+        with self._lock:
+            if self._recurring is None:
+                self._recurring = self._build_recurring()
+            return self._recurring
+
+    def _build_recurring(self):
+        if self._clusters.empty:
+            return pd.DataFrame()
+
+        clusters = self._clusters[self._clusters['occurrences'] >= MIN_OCCURRENCES]
+        period_counts = clusters[list(PERIODS)]
+        period = period_counts.idxmax(axis=1)
+        regularity = period_counts.max(axis=1) / clusters['gap_count']
+        # Sorted by key so ties come out the same however the rows arrived
+        recurring = clusters[regularity >= MIN_REGULARITY].sort_index()
+        period = period[recurring.index]
+
+        last_date = recurring['last_date']
+        next_expected = last_date + pd.to_timedelta(period.map(PERIODS).round(), unit='D')
+        for name, months in CALENDAR_PERIODS.items():
+            calendar = period == name
+            next_expected[calendar] = last_date[calendar] + pd.DateOffset(months=months)
+
+        return pd.DataFrame({
+            'description': recurring['description'],
+            'category': recurring['category'].astype(str),
+            'type': recurring['type'].astype(str),
+            'period': period,
+            'occurrences': recurring['occurrences'].astype(int),
+            'average_amount': (recurring['amount_sum'] / recurring['occurrences']).round(2),
+            'last_date': last_date.dt.date,
+            'next_expected': next_expected.dt.date,
+        }).sort_values('next_expected', kind='stable', ignore_index=True)
+
+    def anomalies(self):
+        '''Flagged expenses, most recent first'''
+        # Updates replace the frame rather than mutating it, so it can be
+        # formatted outside the lock
+        with self._lock:
+            anomalies = self._anomalies
+        if anomalies.empty:
+            return anomalies
+        anomalies = anomalies.sort_values('date', ascending=False, ignore_index=True)
+        return anomalies.assign(
+            date=anomalies['date'].dt.date,
+            typical_amount=anomalies['typical_amount'].round(2),
+            z_score=anomalies['z_score'].round(1)
+        )